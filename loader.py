@@ -3,6 +3,9 @@ from truck import Truck
 from route_optimizer import RouteOptimizer
 from scheduler import Scheduler
 from package import Package
+from plan_exporter import PlanExporter
+import threading
+import time
 
 
 class Loader:
@@ -17,25 +20,62 @@ class Loader:
         - The packages assigned to each truck
     """
     
-    def __init__(self, high_priority_truck : Truck, regular_truck : Truck, route_optimizer : RouteOptimizer):
+    def __init__(self, high_priority_truck : Truck, regular_truck : Truck, route_optimizer : RouteOptimizer,
+                 verbose : bool = True):
         
         self.truck1 : Truck = high_priority_truck
         self.truck2 : Truck = regular_truck
         self.optimizer : RouteOptimizer = route_optimizer
+        self.verbose : bool = verbose  # print progress to the console, turn off for large runs
+        self.undelivered : list = []  # packages that couldn't be loaded on any truck
 
 
 
-    def assign_packages(self, scheduler : Scheduler, packages_dict: dict[Package]):
+    def assign_packages(self, scheduler : Scheduler, packages_dict: dict[Package],
+                        time_budget : float = None, cancel_event : threading.Event = None, seed : int = None):
         
         """
         Assign packages to trucks based on their priority and available capacity
         High-priority packages are assigned to truck 1, while normal packages are assigned to truck 2
         The method also optimizes the delivery routes for both trucks
+        
+        If a time budget (in seconds) is given, the routes are improved until it runs out (split between both trucks),
+            otherwise the greedy routes are used (seed makes the improvements reproducible)
         """
         
         
-        print("\nStarting package assignment and route optimization...")
+        self._log("\nStarting package assignment and route optimization...")
+        
+        # The budget covers every round of route planning below
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        
+        cycles : int = self._assign_from_queue(scheduler)
+        
+        self._log("Optimizing delivery routes...")
+        self._plan_routes(packages_dict, deadline, cancel_event, seed)
+        
+        # The shelf slots are only known once the loading order is fixed,
+            # packages that didn't get one go back to the queue for another round (the other truck may have room)
+        while self._unload_unplaced(self.truck1, scheduler, packages_dict) + \
+                self._unload_unplaced(self.truck2, scheduler, packages_dict) > 0:
+            cycles += self._assign_from_queue(scheduler)
+            self._plan_routes(packages_dict, deadline, cancel_event, seed)
+        
+        # Whatever is still in the queue is not delivered in this run
+        self.undelivered = [package for _, _, package in sorted(scheduler.queue, key=lambda item: item[:2])]
         
+        self._log(f"Assignment completed in {cycles} cycles with {scheduler.aging_count} aging operations")
+        if self.undelivered:
+            self._log(f"WARNING: {len(self.undelivered)} packages couldn't be loaded and won't be delivered")
+
+
+
+    def _assign_from_queue(self, scheduler : Scheduler) -> int:
+        """
+        Assign the packages in the scheduler to the trucks, applying aging when nothing fits
+        
+        :return: Number of assignment cycles
+        """
         cycles : int = 0
         
         # Loop until all packages the scheduler is empty (all packages are assigned) 
@@ -89,34 +129,116 @@ class Loader:
                     
             # If nothing was assigned in this cycle, we need to apply aging to the packages
             if not assigned_something and not scheduler.is_empty():
-                print(f"Applying aging in cycle {cycles} to prevent starvation")
+                self._log(f"Applying aging in cycle {cycles} to prevent starvation")
                 scheduler.apply_aging()
                 
                 # stop againg if we have been through 10 cycles
                 if scheduler.aging_count >= 10:
-                    print("WARNING: Some packages couldn't be assigned after multiple aging cycles")
+                    self._log("WARNING: Some packages couldn't be assigned after multiple aging cycles")
                     break
+        
+        return cycles
+
 
 
-        print("Optimizing delivery routes...")
-        self.truck1.route = self.optimizer.find_best_route(self.truck1.route, packages_dict) # This is a list of package IDs in delivery order
-        self.truck2.route = self.optimizer.find_best_route(self.truck2.route, packages_dict)
+    def _plan_routes(self, packages_dict: dict[Package], deadline : float, cancel_event : threading.Event, seed : int):
+        """
+        Optimize the routes of both trucks and build their loading orders
+        If there is a deadline, the time left is split between both trucks
+        """
+        if deadline is not None:
+            time_budget = max(0, deadline - time.perf_counter())
+        else:
+            time_budget = None
+        
+        if time_budget is None:
+            self.truck1.route = self.optimizer.find_best_route(self.truck1.route, packages_dict) # This is a list of package IDs in delivery order
+            self.truck2.route = self.optimizer.find_best_route(self.truck2.route, packages_dict)
+        
+        else:
+            self.truck1.route = self.optimizer.find_route_within_budget(self.truck1.route, packages_dict,
+                                                                        time_budget / 2, cancel_event, seed=seed)
+            self.truck2.route = self.optimizer.find_route_within_budget(self.truck2.route, packages_dict,
+                                                                        time_budget / 2, cancel_event, seed=seed)
+
+        # Write the tours used in this run to the route cache in one go
+        if self.optimizer.route_cache is not None:
+            self.optimizer.route_cache.flush()
 
         self.truck1.calculate_route_length(packages_dict) 
         self.truck2.calculate_route_length(packages_dict)
 
         self.truck1.create_loading_order(packages_dict)
         self.truck2.create_loading_order(packages_dict)
-        print(f"Assignment completed in {cycles} cycles with {scheduler.aging_count} aging operations")
 
 
 
+    def _unload_unplaced(self, truck : Truck, scheduler : Scheduler, packages_dict: dict[Package]) -> int:
+        """
+        Take the packages without a shelf slot off the truck and send them back to the scheduler
+        The truck won't accept them again, so the next round can only give them to the other truck
+        Removing packages changes the loading order, so the plan is rebuilt until every package has a slot
+        
+        :return: Number of packages sent back
+        """
+        unloaded = 0
+        
+        while truck.loading_plan is not None and not truck.loading_plan["fits_all"]:
+            
+            for package in truck.loading_plan["unplaced"]:
+                truck.remove_package(package)
+                truck.no_slot_ids.add(package.id)
+                scheduler.add(package)
+                unloaded += 1
+                self._log(f"WARNING: no shelf slot left for Package {package.id} in Truck {truck.id}, back to the queue")
+            
+            truck.calculate_route_length(packages_dict)
+            truck.create_loading_order(packages_dict)
+        
+        return unloaded
+
+
+
+    def _log(self, message):
+        """
+        Print a progress message, only when the loader is verbose
+        """
+        if self.verbose:
+            print(message)
+    
+    
+    def show_plans(self, packages_dict):
+        """
+        Print the delivery route and loading order of both trucks, only when the loader is verbose
+        """
+        if not self.verbose:
+            return
+        
+        for truck in [self.truck1, self.truck2]:
+            truck.show_route(packages_dict)
+            truck.show_loading_order()
+
+
     def visualize_routes(self, packages_dict):
+        self._log("\nGenerating route visualizations...")
         self.optimizer.make_route_map(self.truck1, packages_dict)
         self.optimizer.make_route_map(self.truck2, packages_dict)
+        self._log("Route visualizations saved as 'truck_1_route.png' and 'truck_2_route.png'")
+        
+
+    def export_plans(self, packages_dict, exporter : PlanExporter):
+        """
+        Write the routes, loading slots and stats of both trucks as JSONL and as a binary columnar file
+        """
+        trucks = [self.truck1, self.truck2]
+        exporter.write_jsonl(trucks, packages_dict, self.undelivered)
+        exporter.write_columnar(trucks, packages_dict, self.undelivered)
         
 
     def print_summary(self):
+        if not self.verbose:
+            return
+        
         self.truck1.get_stats()
         self.truck2.get_stats()
         total_packages = (self.truck1.stats["high"] + self.truck1.stats["normal"] +
@@ -125,6 +247,10 @@ class Loader:
         print("\n===== DELIVERY SUMMARY =====")
         print(f"Total packages: {total_packages}")
         
+        if self.undelivered:
+            print(f"Undelivered packages: {len(self.undelivered)} --> "
+                  f"{', '.join(str(package.id) for package in self.undelivered)}")
+        
         for truck in [self.truck1, self.truck2]:
             print(f"\nTruck {truck.id} ({truck.role}):")
             print(f"  Packages loaded: {len(truck.packages_to_load)}")
@@ -133,5 +259,9 @@ class Loader:
             print(f"  Normal priority packages: {truck.stats['normal']}")
             print(f"  Total weight: {truck.stats['weight']}/{truck.max_capacity} units")
             print(f"  Capacity usage: {truck.stats['usage']:.1f}%")
+            
+            if truck.loading_plan is not None and truck.max_volume is not None:
+                print(f"  Total volume: {truck.stats['size']}/{truck.max_volume} units")
+                print(f"  Volume usage: {truck.loading_plan['volume_usage']:.1f}%")
         
     
@@ -0,0 +1,106 @@
+from package import Package  # For type hinting
+
+
+class LoadingPlanner:
+    """
+    Assigns packages to compartments and shelf slots inside a truck, using both their size and weight
+
+    The cargo space is split into compartments from the back of the truck (compartment 1) to the door,
+    and every compartment into shelves from the floor (shelf 1) upwards:
+        - Packages are placed in LIFO order, so the last delivery goes to the back and the first one next to the door
+        - Compartments are filled one after the other, a compartment is only closed once a light package doesn't fit in it,
+            so a package is never blocked by a later delivery
+        - Inside a compartment, a package goes on the lowest shelf with room left (skyline heuristic)
+        - Heavy packages can only go on the floor shelf, if the floor of the current compartment is full
+            they go on the first free floor towards the door, and the upper shelves stay open for light packages
+        - A package bigger than a shelf can't be placed anywhere, it is left out without closing any compartment
+
+    Every package is looked at once and every shelf of the open compartments at most once --> O(n * compartments * shelves) complexity
+    """
+
+    def __init__(self, num_compartments=4, shelves_per_compartment=2, max_shelf_weight=7):
+
+        self.num_compartments = num_compartments
+        self.shelves_per_compartment = shelves_per_compartment
+        self.max_shelf_weight = max_shelf_weight  # heaviest package allowed above the floor shelf
+
+
+    def plan(self, packages_in_loading_order: list[Package], volume_capacity=None, weight_capacity=None) -> dict:
+        """
+        Plan the loading of the packages (already in LIFO loading order)
+        If the truck has no volume capacity, shelves are unbounded and everything fits in the back compartment
+
+        :return: Dictionary with the slot of every package, the packages that didn't fit and the utilization
+        """
+        if volume_capacity is None:
+            shelf_volume = float('inf')
+        else:
+            shelf_volume = volume_capacity / (self.num_compartments * self.shelves_per_compartment)
+
+        slots = []
+        unplaced = []
+        used_volume = 0
+        used_weight = 0
+
+        # Free volume of each shelf, floor first, for every compartment
+        shelf_space = [[shelf_volume] * self.shelves_per_compartment for _ in range(self.num_compartments)]
+        current = 0  # first compartment still open, the ones behind it are closed
+
+        for package in packages_in_loading_order:
+
+            # Doesn't fit even on an empty shelf --> don't close any compartment for it
+            if package.size > shelf_volume:
+                unplaced.append(package)
+                continue
+
+            compartment = current
+            shelf = self._find_shelf(package, shelf_space[compartment])
+
+            while shelf is None and compartment < self.num_compartments - 1:
+
+                # A light package can use every shelf, if it doesn't fit the compartment is full --> close it
+                if package.weight <= self.max_shelf_weight and compartment == current:
+                    current += 1
+
+                compartment += 1
+                shelf = self._find_shelf(package, shelf_space[compartment])
+
+            if shelf is None:
+                unplaced.append(package)
+                continue
+
+            shelf_space[compartment][shelf] -= package.size
+            used_volume += package.size
+            used_weight += package.weight
+
+            slots.append({
+                "package_id": package.id,
+                "compartment": compartment + 1,
+                "shelf": shelf + 1,
+            })
+
+        return {
+            "slots": slots,
+            "unplaced": unplaced,
+            "volume": used_volume,
+            "volume_usage": (used_volume / volume_capacity) * 100 if volume_capacity else 0,
+            "weight": used_weight,
+            "weight_usage": (used_weight / weight_capacity) * 100 if weight_capacity else 0,
+            "fits_all": not unplaced,
+        }
+
+
+    def _find_shelf(self, package: Package, shelf_space: list):
+        """
+        Lowest shelf of the current compartment where the package fits, or None
+        """
+        for shelf, free_volume in enumerate(shelf_space):
+
+            # Heavy packages stay on the floor
+            if shelf > 0 and package.weight > self.max_shelf_weight:
+                break
+
+            if package.size <= free_volume:
+                return shelf
+
+        return None
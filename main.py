@@ -1,12 +1,15 @@
+import os
 import random
 from truck import Truck
 from package import Package
 from route_optimizer import RouteOptimizer
+from route_cache import RouteCache
 from scheduler import Scheduler
 from loader import Loader
+from plan_exporter import PlanExporter
 
 
-def generate_packages(num_packages: int=20) -> dict[Package]:
+def generate_packages(num_packages: int=20, verbose: bool=True) -> dict[Package]:
     """
     Generate a dictionary of packages with random attributes
     """
@@ -25,7 +28,8 @@ def generate_packages(num_packages: int=20) -> dict[Package]:
         packages[new_package.id] = new_package
     
     # print the information of the packages just generated
-    print_package_info(packages)
+    if verbose:
+        print_package_info(packages)
         
     return packages
 
@@ -55,13 +59,15 @@ def create_trucks(
     warehouse: tuple[int, int],
     capacity1: int=100,
     capacity2: int=100,
+    volume1: int=120,
+    volume2: int=120,
     ) -> tuple[Truck, Truck]:
     """
     Create two trucks form the same warehouse, one for high-priority and one for normal packages
     """
     
-    truck1: Truck = Truck(1, capacity1, "High-priority", warehouse)
-    truck2: Truck = Truck(2, capacity2, "Normal", warehouse)
+    truck1: Truck = Truck(1, capacity1, "High-priority", warehouse, volume1)
+    truck2: Truck = Truck(2, capacity2, "Normal", warehouse, volume2)
     
     return truck1, truck2
 
@@ -135,14 +141,16 @@ def run_scenario_3():
 def run_simulation(packages: dict[Package] = None,
                    truck1: Truck = None,
                    truck2: Truck = None,
-                   data_folder_name = "data"
+                   data_folder_name = "data",
+                   time_budget: float = None,
+                   verbose: bool = True
                    ) -> None:
     
     random.seed(13) # For reproducibility
     warehouse = (5, 5) # Warehouse coordinates 
     
     if packages is None:
-        packages = generate_packages(20)
+        packages = generate_packages(20, verbose)
     
     if truck1 is None or truck2 is None:
         truck1, truck2 = create_trucks(warehouse)
@@ -151,22 +159,27 @@ def run_simulation(packages: dict[Package] = None,
     for package in packages.values():
         scheduler.add(package)
 
-    optimizer = RouteOptimizer(warehouse, data_folder_name)
+    # Tours are cached next to the route maps, so re-running a scenario reuses the previous tours
+    current_file_path = os.path.dirname(os.path.abspath(__file__))
+    route_cache = RouteCache(os.path.join(current_file_path, data_folder_name, "route_cache.json"))
+
+    optimizer = RouteOptimizer(warehouse, data_folder_name, route_cache)
     
-    loader = Loader(truck1, truck2, optimizer)
-    loader.assign_packages(scheduler, packages)
+    loader = Loader(truck1, truck2, optimizer, verbose)
+    loader.assign_packages(scheduler, packages, time_budget, seed=13)
 
-    truck1.show_route(packages)
-    truck1.show_loading_order()
-    truck2.show_route(packages)
-    truck2.show_loading_order()
+    loader.show_plans(packages)
 
     loader.print_summary()
 
-    print("\nGenerating route visualizations...")
+    # Structured export for downstream systems, written next to the route maps
+    loader.export_plans(packages, PlanExporter(os.path.join(current_file_path, data_folder_name)))
+
     loader.visualize_routes(packages)
-    print("Route visualizations saved as 'truck_1_route.png' and 'truck_2_route.png'")
-    print("\nLogistics system simulation complete!\n\n")
+    
+    if verbose:
+        print("Plans exported as 'plan.jsonl' and 'plan.bin'")
+        print("\nLogistics system simulation complete!\n\n")
 
 
 
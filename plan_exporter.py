@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import struct
+from package import Package  # For type hinting
+from truck import Truck  # For type hinting
+
+
+class PlanExporter:
+    """
+    Writes the delivery plans and loading manifests to files, so downstream systems don't have to scrape the console
+
+    Two formats are supported:
+        - JSONL --> one JSON record per line, streamed (one record per stop, then one per truck,
+            then one per undelivered package)
+        - Columnar binary --> every column is stored as one packed block, so it can be read back in bulk
+
+    Binary layout (little-endian, fixed width, no padding):
+        magic b"PLAN", uint16 number of tables, then for every table:
+            uint8 name length, name, uint32 number of rows, uint16 number of columns,
+            for every column: uint8 name length, name, 1 byte type ("i" = signed int, "d" = float), uint8 item size in bytes,
+            then the data of every column, one after the other
+        Columns are written as int32 ("i", 4 bytes) or float64 ("d", 8 bytes)
+
+    Source:
+        - https://docs.python.org/3/library/struct.html
+    """
+
+    MAGIC = b"PLAN"
+
+    # Columns of the stops table --> (name, struct format character)
+    STOP_COLUMNS = [
+        ("truck_id", "i"), ("stop", "i"), ("package_id", "i"), ("x", "d"), ("y", "d"),
+        ("leg_distance", "d"), ("cumulative_distance", "d"),
+        ("load_position", "i"), ("compartment", "i"), ("shelf", "i"),
+    ]
+
+    # Columns of the undelivered packages table
+    UNDELIVERED_COLUMNS = [
+        ("package_id", "i"), ("x", "d"), ("y", "d"), ("size", "d"), ("weight", "d"), ("priority", "i"),
+    ]
+
+    # Columns of the trucks table
+    TRUCK_COLUMNS = [
+        ("truck_id", "i"), ("packages", "i"), ("high", "i"), ("normal", "i"), ("weight", "d"), ("size", "d"),
+        ("usage", "d"), ("volume_usage", "d"), ("route_distance", "d"),
+    ]
+
+
+    def __init__(self, output_folder, buffer_size=1 << 16):
+
+        self.output_folder = output_folder
+        self.buffer_size = buffer_size  # size of the write buffer, so records are written to disk in bulk
+
+
+    def stop_records(self, truck: Truck, packages_dict: dict[Package]):
+        """
+        Generator of one record per stop of the truck route, in delivery order
+        Packages without a shelf slot (or trucks without a loading plan) get -1 as compartment and shelf
+        """
+        load_positions = {package.id: i for i, package in enumerate(truck.packages_to_load, 1)}
+
+        slots = {}
+        if truck.loading_plan is not None:
+            slots = {slot["package_id"]: slot for slot in truck.loading_plan["slots"]}
+
+        current = truck.starting_point
+        cumulative_distance = 0
+
+        for stop, pkg_id in enumerate(truck.route, 1):
+            package = packages_dict[pkg_id]
+            x, y = package.coordinates
+
+            leg_distance = math.sqrt((current[0] - x)**2 + (current[1] - y)**2)
+            cumulative_distance += leg_distance
+            current = package.coordinates
+
+            slot = slots.get(pkg_id, {})
+
+            yield {
+                "truck_id": truck.id,
+                "stop": stop,
+                "package_id": pkg_id,
+                "x": x,
+                "y": y,
+                "leg_distance": leg_distance,
+                "cumulative_distance": cumulative_distance,
+                "load_position": load_positions.get(pkg_id, -1),
+                "compartment": slot.get("compartment", -1),
+                "shelf": slot.get("shelf", -1),
+            }
+
+
+    def truck_record(self, truck: Truck) -> dict:
+        """
+        Record with the statistics of the truck --> read from its running aggregates
+        """
+        stats = truck.get_stats()
+        volume_usage = truck.loading_plan["volume_usage"] if truck.loading_plan is not None else 0
+
+        return {
+            "truck_id": truck.id,
+            "packages": len(truck.route),
+            "high": stats["high"],
+            "normal": stats["normal"],
+            "weight": stats["weight"],
+            "size": stats["size"],
+            "usage": stats["usage"],
+            "volume_usage": volume_usage,
+            "route_distance": truck.route_distance,
+        }
+
+
+    def undelivered_record(self, package: Package) -> dict:
+        """
+        Record of a package that couldn't be loaded on any truck
+        """
+        x, y = package.coordinates
+
+        return {
+            "package_id": package.id,
+            "x": x,
+            "y": y,
+            "size": package.size,
+            "weight": package.weight,
+            "priority": package.priority,
+        }
+
+
+    def write_jsonl(self, trucks: list[Truck], packages_dict: dict[Package], undelivered: list[Package] = (),
+                    filename="plan.jsonl") -> str:
+        """
+        Stream the plan of every truck, and the packages that are not delivered, to a JSONL file
+
+        :return: Path of the file written
+        """
+        path = self._make_path(filename)
+
+        with open(path, "w", buffering=self.buffer_size) as f:
+            for truck in trucks:
+                f.writelines(json.dumps({"type": "stop", **record}) + "\n"
+                             for record in self.stop_records(truck, packages_dict))
+
+            for truck in trucks:
+                f.write(json.dumps({"type": "truck", "role": truck.role, **self.truck_record(truck)}) + "\n")
+
+            f.writelines(json.dumps({"type": "undelivered", **self.undelivered_record(package)}) + "\n"
+                         for package in undelivered)
+
+        return path
+
+
+    def write_columnar(self, trucks: list[Truck], packages_dict: dict[Package], undelivered: list[Package] = (),
+                       filename="plan.bin") -> str:
+        """
+        Write the plan of every truck to a binary columnar file, with a "stops", a "trucks" and an "undelivered" table
+
+        :return: Path of the file written
+        """
+        stop_columns = {name: (typecode, []) for name, typecode in self.STOP_COLUMNS}
+        for truck in trucks:
+            for record in self.stop_records(truck, packages_dict):
+                for name, (_, column) in stop_columns.items():
+                    column.append(record[name])
+
+        truck_columns = {name: (typecode, []) for name, typecode in self.TRUCK_COLUMNS}
+        for truck in trucks:
+            record = self.truck_record(truck)
+            for name, (_, column) in truck_columns.items():
+                column.append(record[name])
+
+        undelivered_columns = {name: (typecode, []) for name, typecode in self.UNDELIVERED_COLUMNS}
+        for package in undelivered:
+            record = self.undelivered_record(package)
+            for name, (_, column) in undelivered_columns.items():
+                column.append(record[name])
+
+        path = self._make_path(filename)
+
+        with open(path, "wb", buffering=self.buffer_size) as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack("<H", 3))
+            self._write_table(f, "stops", stop_columns)
+            self._write_table(f, "trucks", truck_columns)
+            self._write_table(f, "undelivered", undelivered_columns)
+
+        return path
+
+
+    @classmethod
+    def read_columnar(cls, path) -> dict:
+        """
+        Read a file written by write_columnar
+
+        :return: Dictionary with this structure: {table name: {column name: list of values}}
+        """
+        with open(path, "rb") as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError(f"Error: {path} is not a plan file")
+
+            tables = {}
+            (num_tables,) = struct.unpack("<H", f.read(2))
+
+            for _ in range(num_tables):
+                table_name = cls._read_name(f)
+                num_rows, num_columns = struct.unpack("<IH", f.read(6))
+
+                headers = []
+                for _ in range(num_columns):
+                    name = cls._read_name(f)
+                    typecode = f.read(1).decode("ascii")
+                    (item_size,) = struct.unpack("<B", f.read(1))
+
+                    if struct.calcsize("<" + typecode) != item_size:
+                        raise ValueError(f"Error: column {name} has an unsupported type {typecode}{item_size}")
+                    headers.append((name, typecode, item_size))
+
+                columns = {}
+                for name, typecode, item_size in headers:
+                    data = f.read(num_rows * item_size)
+                    columns[name] = list(struct.unpack(f"<{num_rows}{typecode}", data))
+
+                tables[table_name] = columns
+
+        return tables
+
+
+    def _write_table(self, f, table_name, columns: dict):
+        """
+        Write one table: its header, then every column as one block of raw bytes
+        columns is a dictionary with this structure: {column name: (struct format character, list of values)}
+        """
+        num_rows = len(next(iter(columns.values()))[1]) if columns else 0
+
+        self._write_name(f, table_name)
+        f.write(struct.pack("<IH", num_rows, len(columns)))
+
+        for name, (typecode, _) in columns.items():
+            self._write_name(f, name)
+            f.write(typecode.encode("ascii"))
+            f.write(struct.pack("<B", struct.calcsize("<" + typecode)))
+
+        # "<" --> little-endian with standard sizes, the same bytes on every platform
+        for typecode, column in columns.values():
+            f.write(struct.pack(f"<{num_rows}{typecode}", *column))
+
+
+    @staticmethod
+    def _write_name(f, name):
+        encoded = name.encode("utf-8")
+        f.write(struct.pack("<B", len(encoded)))
+        f.write(encoded)
+
+
+    @staticmethod
+    def _read_name(f) -> str:
+        (length,) = struct.unpack("<B", f.read(1))
+        return f.read(length).decode("utf-8")
+
+
+    def _make_path(self, filename) -> str:
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+        return os.path.join(self.output_folder, filename)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from collections import Counter, OrderedDict
+
+
+class RouteCache:
+    """
+    Persistent on-disk cache of delivery tours, so repeated manifests don't have to be re-planned from scratch
+
+    It keeps track of:
+        - The tours already computed, keyed by a content hash of the warehouse and the stop set
+        - The order in which the tours were used, to evict the least recently used one when the cache is full
+
+    Stops are stored as coordinates (not package IDs), because package IDs change from one manifest to the next
+    Changes (new tours and cache hits) are only kept in memory until flush() writes them to disk in one go
+
+    Source:
+        - https://docs.python.org/3/library/collections.html#collections.OrderedDict
+    """
+
+    def __init__(self, path, max_entries=128, max_changes=5):
+
+        self.path = path  # JSON file where the cache is persisted
+        self.max_entries = max_entries  # size bound, least recently used tours are evicted first
+        self.max_changes = max_changes  # max number of changed stops to still warm start from a cached tour
+
+        self.entries : OrderedDict = OrderedDict()  # {key: {"warehouse": [x, y], "tour": [[x, y], ...]}}, oldest first
+        self._dirty = False  # True if the entries (or their order) changed since the last write to disk
+        self._load()
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    @staticmethod
+    def make_key(warehouse, stops) -> str:
+        """
+        Content hash of a stop set --> the order of the stops doesn't matter, only which stops there are
+        """
+        content = json.dumps([list(warehouse), sorted(list(stop) for stop in stops)])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+    def get(self, warehouse, stops):
+        """
+        Return the cached tour (list of coordinates) for exactly this stop set, or None on a miss
+        """
+        key = self.make_key(warehouse, stops)
+
+        if key not in self.entries:
+            return None
+
+        # Mark it as the most recently used --> O(1) complexity
+        self.entries.move_to_end(key)
+        self._dirty = True
+        return [tuple(stop) for stop in self.entries[key]["tour"]]
+
+
+    def get_nearest(self, warehouse, stops):
+        """
+        Find the cached tour from the same warehouse that differs the least from this stop set
+        The changes are counted in changed stops: swapping one stop for another is 1 change, and so is adding or removing one
+
+        :return: (tour, removed, added) where removed/added are Counters of the stops that changed,
+                    or None if no cached tour is within max_changes
+        """
+        wanted = Counter(tuple(stop) for stop in stops)
+        best = None
+        best_changes = self.max_changes + 1
+
+        # Linear scan over the cache --> O(max_entries * n) complexity, bounded by the cache size
+        for key, entry in self.entries.items():
+            if tuple(entry["warehouse"]) != tuple(warehouse):
+                continue
+
+            tour = [tuple(stop) for stop in entry["tour"]]
+            cached = Counter(tour)
+            removed = cached - wanted
+            added = wanted - cached
+            changes = max(sum(removed.values()), sum(added.values()))
+
+            if changes < best_changes:
+                best_changes = changes
+                best = (key, tour, removed, added)
+
+        if best is None:
+            return None
+
+        key, tour, removed, added = best
+        self.entries.move_to_end(key)
+        self._dirty = True
+        return tour, removed, added
+
+
+    def put(self, warehouse, tour):
+        """
+        Store a tour (list of coordinates in delivery order), it is written to disk on the next flush
+        """
+        key = self.make_key(warehouse, tour)
+        self.entries[key] = {"warehouse": list(warehouse), "tour": [list(stop) for stop in tour]}
+        self.entries.move_to_end(key)
+
+        # Evict the least recently used tours if the cache is over its size bound
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        self._dirty = True
+
+
+    def flush(self):
+        """
+        Write the cache to disk, only if something changed since the last write
+        """
+        if self._dirty:
+            self.save()
+
+
+    def save(self):
+        """
+        Write the cache to disk, the entries are kept in LRU order (oldest first)
+        """
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # Write to a temporary file first so a crash never leaves a half written cache behind
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+    def _load(self):
+        """
+        Read the cache from disk, a missing or corrupted file just means an empty cache
+        """
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self.entries = OrderedDict((key, entry) for key, entry in items)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
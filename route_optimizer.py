@@ -2,7 +2,12 @@ import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 import math
 import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
 from package import Package  # For type hinting
+from route_cache import RouteCache  # For type hinting
 
 
 class RouteOptimizer:
@@ -10,9 +15,11 @@ class RouteOptimizer:
     Handles route optimization for delivery trucks
     """
     
-    def __init__(self, warehouse=(0, 0), data_folder_name="data"):
+    def __init__(self, warehouse=(0, 0), data_folder_name="data", route_cache: RouteCache = None):
         self.warehouse = warehouse # coordinates of the warehouse where packages are loaded
         self.data_folder_name = data_folder_name
+        self.route_cache = route_cache # optional cache of previous tours, to warm start repeated manifests
+        self.max_repair_growth = 1.25 # a repaired tour more than 25% longer than the cached one is planned from scratch
     
     def calc_distance(self, p1, p2):
         """
@@ -23,15 +30,156 @@ class RouteOptimizer:
     
     
     
-    def find_best_route(self, package_ids: list, packages_dict: dict[Package]) -> list[int]:
+    def find_best_route(self, package_ids: list, packages_dict: dict[Package], polish=True) -> list[int]:
         """
         Find the best route for a truck to deliver packages using a greedy nearest neighbor approach
+        If a route cache is set, a tour from a previous run is reused (or repaired) instead
+            (the new tours stay in memory until route_cache.flush() is called)
+        polish=False skips the 2-opt pass around the stops inserted in a repaired tour
         
         :return: List of package IDs in the order they should be delivered
         """
         if not package_ids:
             return []
         
+        if self.route_cache is None:
+            return self._nearest_neighbor_route(package_ids, packages_dict)
+        
+        stops = [packages_dict[pkg_id].coordinates for pkg_id in package_ids]
+        
+        # 1. Exact hit --> same stop set as a previous run
+        tour = self.route_cache.get(self.warehouse, stops)
+        
+        # 2. Near hit --> only a few stops changed, repair the previous tour and polish it around the new stops
+        if tour is None:
+            nearest = self.route_cache.get_nearest(self.warehouse, stops)
+            if nearest is not None:
+                cached_tour, removed, added = nearest
+                tour = self.repair_tour(cached_tour, removed, added)
+                if polish:
+                    tour = self.improve_tour(tour, [i for i, stop in enumerate(tour) if stop in added])
+                
+                # Sanity check --> O(n) complexity, a repair that made the tour much longer is dropped
+                    # and planned from scratch, so a bad patch can't pile up in the cache from one run to the next
+                if self._stops_length(tour) > self._stops_length(cached_tour) * self.max_repair_growth:
+                    tour = None
+                else:
+                    self.route_cache.put(self.warehouse, tour)
+        
+        # 3. Miss --> plan from scratch
+        if tour is None:
+            route = self._nearest_neighbor_route(package_ids, packages_dict)
+            self.route_cache.put(self.warehouse, [packages_dict[pkg_id].coordinates for pkg_id in route])
+            return route
+        
+        return self._tour_to_route(tour, package_ids, packages_dict)
+    
+    
+    
+    def repair_tour(self, tour: list, removed, added) -> list:
+        """
+        Repair a previous tour (list of coordinates) so it visits the new stop set
+            - Delete the stops that are no longer in the manifest
+            - Insert the new stops where they add the least distance (cheapest insertion)
+        
+        removed and added are Counters of coordinates --> {coordinates: number of stops}
+        """
+        removed = removed.copy()
+        repaired = []
+        
+        # Delete stops --> O(n) complexity
+        for stop in tour:
+            if removed[stop] > 0:
+                removed[stop] -= 1
+            else:
+                repaired.append(stop)
+        
+        # Insert stops --> O(n) complexity for each new stop
+        for stop, count in added.items():
+            for _ in range(count):
+                best_idx = 0
+                best_cost = float('inf')
+                
+                # Try every gap of the tour, including the legs from and back to the warehouse
+                for i in range(len(repaired) + 1):
+                    prev_stop = repaired[i - 1] if i > 0 else self.warehouse
+                    next_stop = repaired[i] if i < len(repaired) else self.warehouse
+                    cost = (self.calc_distance(prev_stop, stop) + self.calc_distance(stop, next_stop)
+                            - self.calc_distance(prev_stop, next_stop))
+                    
+                    if cost < best_cost:
+                        best_cost = cost
+                        best_idx = i
+                
+                repaired.insert(best_idx, stop)
+        
+        return repaired
+    
+    
+    
+    def improve_tour(self, tour: list, around: list, window=10) -> list:
+        """
+        Improve a tour (list of coordinates) with 2-opt, only around the given positions of the tour
+        Only segments starting and ending within window stops of a given position are tried
+            --> O(len(around) * window^2) complexity, no matter how long the tour is
+        
+        Source:
+            - https://en.wikipedia.org/wiki/2-opt
+        """
+        # Warehouse at both ends, so the legs from and back to the warehouse can be improved too
+        stops = [self.warehouse] + list(tour) + [self.warehouse]
+        n = len(tour)
+        
+        for position in around:
+            start = max(1, position + 1 - window)  # +1 --> shifted by the warehouse at the start
+            end = min(n, position + 1 + window)
+            
+            for i in range(start, end):
+                for j in range(i + 1, end + 1):
+                    if self._two_opt_delta(stops, i, j) < -1e-9:
+                        stops[i:j + 1] = stops[i:j + 1][::-1]
+        
+        return stops[1:-1]
+    
+    
+    
+    def _two_opt_delta(self, stops: list, i: int, j: int) -> float:
+        """
+        Change of the tour length when reversing stops[i..j] --> only the two legs at the ends change, O(1) complexity
+        stops must start and end with the warehouse
+        """
+        a, b, c, d = stops[i - 1], stops[i], stops[j], stops[j + 1]
+        return (self.calc_distance(a, c) + self.calc_distance(b, d)
+                - self.calc_distance(a, b) - self.calc_distance(c, d))
+    
+    
+    
+    def _stops_length(self, tour: list) -> float:
+        """
+        Length of a tour of coordinates, starting and ending at the warehouse
+        """
+        stops = [self.warehouse] + list(tour) + [self.warehouse]
+        return sum(self.calc_distance(stops[i], stops[i + 1]) for i in range(len(stops) - 1))
+    
+    
+    
+    def _tour_to_route(self, tour: list, package_ids: list, packages_dict: dict[Package]) -> list[int]:
+        """
+        Map a tour of coordinates back to package IDs
+        Several packages can share the same coordinates, they are delivered in the order they were given
+        """
+        ids_at_stop = defaultdict(deque)
+        for pkg_id in package_ids:
+            ids_at_stop[packages_dict[pkg_id].coordinates].append(pkg_id)
+        
+        return [ids_at_stop[stop].popleft() for stop in tour]
+    
+    
+    
+    def _nearest_neighbor_route(self, package_ids: list, packages_dict: dict[Package]) -> list[int]:
+        """
+        Greedy nearest neighbor tour starting from the warehouse
+        """
         # Initialize variables
         current_pos: tuple[int, int] = self.warehouse # Start from warehouse
         packages_to_visit = package_ids.copy()  # Copy to avoid modifying the original list
@@ -64,6 +212,114 @@ class RouteOptimizer:
     
     
     
+    def tour_length(self, route: list[int], packages_dict: dict[Package]) -> float:
+        """
+        Length of a route, starting and ending at the warehouse
+        """
+        total_distance = 0
+        current = self.warehouse
+        
+        for pkg_id in route:
+            next_stop = packages_dict[pkg_id].coordinates
+            total_distance += self.calc_distance(current, next_stop)
+            current = next_stop
+        
+        return total_distance + self.calc_distance(current, self.warehouse)
+    
+    
+    
+    def optimize_anytime(self, package_ids: list, packages_dict: dict[Package], time_budget: float,
+                         cancel_event: threading.Event = None, callback=None, seed=None):
+        """
+        Anytime route optimization within a wall-clock budget (in seconds)
+            - A starting route (cached, repaired or greedy) is delivered at once
+            - It is then improved with simulated annealing over 2-opt moves (reverse a segment of the route)
+            - Every time a better route is found it is yielded (and passed to the callback, if any)
+        
+        Setting cancel_event from another thread stops the search, the best route so far is kept
+        The same seed always tries the same moves, the budget only decides how many of them are tried
+        
+        Sources:
+            - https://en.wikipedia.org/wiki/2-opt
+            - https://en.wikipedia.org/wiki/Simulated_annealing
+        
+        :return: Generator of (route, distance) tuples, each one shorter than the previous
+        """
+        deadline = time.perf_counter() + time_budget
+        
+        # Cheapest starting route (cached, repaired or greedy, no 2-opt), all the improving is left to the loop below
+            # so the deadline and the cancel event apply to every step of it
+        route = self.find_best_route(package_ids, packages_dict, polish=False)
+        best_distance = self.tour_length(route, packages_dict)
+        
+        if callback is not None:
+            callback(route, best_distance)
+        yield route, best_distance
+        
+        if len(route) < 3:
+            return
+        
+        # Work on the stops with the warehouse at both ends, so every 2-opt move only changes two legs --> O(1) complexity
+        rng = random.Random(seed)  # own generator, so the global random state (used for the scenarios) is not touched
+        ids = [None] + route + [None]
+        stops = [self.warehouse] + [packages_dict[pkg_id].coordinates for pkg_id in route] + [self.warehouse]
+        n = len(route)
+        
+        current_distance = best_distance
+        temperature = best_distance / (n + 1) * 0.1  # start at a fraction of the average leg length
+        iteration = 0
+        
+        while True:
+            
+            # Check the clock and the cancel flag only every few moves, they are slower than a move
+                # Cooling depends on the number of moves (not on the clock), so the same seed always tries the same moves
+            if iteration % 256 == 0:
+                if time.perf_counter() >= deadline or (cancel_event is not None and cancel_event.is_set()):
+                    break
+                if iteration > 0:
+                    temperature *= 0.99
+            iteration += 1
+            
+            i = rng.randint(1, n - 1)
+            j = rng.randint(i + 1, n)
+            
+            delta = self._two_opt_delta(stops, i, j)
+            
+            # Always take improvements, take worse routes with a probability that shrinks as the temperature cools down
+            if delta >= 0 and (temperature <= 0 or rng.random() >= math.exp(-delta / temperature)):
+                continue
+            
+            stops[i:j + 1] = stops[i:j + 1][::-1]
+            ids[i:j + 1] = ids[i:j + 1][::-1]
+            current_distance += delta
+            
+            if current_distance < best_distance - 1e-9:
+                best_distance = current_distance
+                route = ids[1:-1]
+                
+                if callback is not None:
+                    callback(route, best_distance)
+                yield route, best_distance
+        
+        # Remember the improved route for the next run
+        if self.route_cache is not None:
+            self.route_cache.put(self.warehouse, [packages_dict[pkg_id].coordinates for pkg_id in route])
+    
+    
+    
+    def find_route_within_budget(self, package_ids: list, packages_dict: dict[Package], time_budget: float,
+                                 cancel_event: threading.Event = None, callback=None, seed=None) -> list[int]:
+        """
+        Run the anytime optimization until the budget runs out (or it is cancelled) and return the best route found
+        """
+        route = []
+        for route, _ in self.optimize_anytime(package_ids, packages_dict, time_budget, cancel_event, callback, seed):
+            pass
+        
+        return route
+    
+    
+    
     def make_route_map(self, truck, packages_dict):
         """
         Method to create a route map for the truck
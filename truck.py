@@ -1,20 +1,34 @@
 import math
+from loading_planner import LoadingPlanner
 
 class Truck:
     """
     Class representing a delivery truck
     """
-    def __init__(self, id, capacity, role, warehouse=(0, 0)):
+    def __init__(self, id, capacity, role, warehouse=(0, 0), volume=None, loading_planner=None):
         
         self.id = id
         self.max_capacity = capacity # maximum weight capacity
+        self.max_volume = volume # maximum cargo volume (sum of package sizes), None if not limited
         self.role = role  # High-priority or Normal
         self.starting_point = warehouse # coordinates of the warehouse
         
         self.current_weight = 0
+        self.current_volume = 0
+        
+        # Running aggregates, updated on every add/remove so stats never need a rescan --> O(1) complexity
+            # Packages only age while they wait in the scheduler, never once they are loaded,
+            # so the priority class a package is counted under can't change while it is on the truck
+        self.priority_counts = {"High": 0, "Normal": 0}  # number of packages per priority class
+        self._counted_labels = {}  # {package_id: priority label the package is counted under}
+        
         self.route = []         # delivery sequence :  #ist of package IDs in delivery order
         self.packages_to_load = []  # list of Package objects, in LIFO loading order
         self.route_distance = 0   # total length of the completed route
+        
+        self.loading_planner = loading_planner if loading_planner is not None else LoadingPlanner()
+        self.loading_plan = None  # compartment/shelf slot of every package, built with the loading order
+        self.no_slot_ids = set()  # packages the loading plan had no shelf slot for, they are not accepted again
     
     
     def __str__(self):
@@ -23,8 +37,15 @@ class Truck:
     
     def has_capacity_for(self, package):
         """
-        Method to check if the truck has enough capacity for a new package (based on weight)
+        Method to check if the truck has enough capacity for a new package (based on weight and volume)
+        The shelf slot can only be checked once the loading order is built, see Loader._unload_unplaced
         """
+        if package.id in self.no_slot_ids:
+            return False
+        
+        if self.max_volume is not None and self.current_volume + package.size > self.max_volume:
+            return False
+        
         return self.current_weight + package.weight <= self.max_capacity
     
 
@@ -34,6 +55,28 @@ class Truck:
         """
         self.route.append(package.id)
         self.current_weight += package.weight
+        self.current_volume += package.size
+        
+        label = package.priority_label
+        self.priority_counts[label] += 1
+        self._counted_labels[package.id] = label
+    
+    
+    def remove_package(self, package):
+        """
+        Method to remove a package from the delivery route
+        The loading order has to be rebuilt afterwards with create_loading_order
+        """
+        # Check first, so the aggregates are never touched for a package that isn't on the truck
+        if package.id not in self._counted_labels:
+            raise ValueError(f"Error: Package {package.id} is not on Truck {self.id}")
+        
+        label = self._counted_labels.pop(package.id)
+        self.priority_counts[label] -= 1
+        self.current_weight -= package.weight
+        self.current_volume -= package.size
+        
+        self.route.remove(package.id)  # --> O(n) complexity, the aggregates above are O(1)
     
     
     def create_loading_order(self, packages_dict):
@@ -50,6 +93,9 @@ class Truck:
             # packages_dict has this structure: {package_id: Package object}
             # route has the package IDs in delivery order
             self.packages_to_load.append(packages_dict[package_id])
+        
+        # Assign every package to a compartment and shelf slot, following the loading order
+        self.loading_plan = self.loading_planner.plan(self.packages_to_load, self.max_volume, self.max_capacity)
     
     
 
@@ -106,35 +152,37 @@ class Truck:
         Print the loading order for the truck
         """
         print(f"\nLoading Order for Truck {self.id} (LIFO):")
+        
+        slots = {}
+        if self.loading_plan is not None:
+            slots = {slot["package_id"]: slot for slot in self.loading_plan["slots"]}
+        
         for i, package in enumerate(self.packages_to_load, 1):
-            print(f"  {i}. Load Package {package}")
+            if package.id in slots:
+                slot = slots[package.id]
+                print(f"  {i}. Load Package {package} --> compartment {slot['compartment']}, shelf {slot['shelf']}")
+            else:
+                print(f"  {i}. Load Package {package}")
+        
+        if self.loading_plan is not None:
+            for package in self.loading_plan["unplaced"]:
+                print(f"  WARNING: no shelf slot left for Package {package.id}")
     
     
     
     def get_stats(self):
         """
-        Calculate statistics about the packages loaded in the truck
+        Snapshot of the statistics about the packages loaded in the truck
+        It is read from the running aggregates, so it costs the same no matter how many packages are loaded
         """
         
-        if not self.packages_to_load:
-            stats_dict = {"high": 0, "normal": 0, "weight": 0, "usage": 0}
-        
-        high_count = 0
-        normal_count = 0
-        total_weight = 0
-        
-        for package in self.packages_to_load:
-            if package.priority_label == 'High':
-                high_count += 1
-            else:
-                normal_count += 1
-            total_weight += package.weight
-        
         stats_dict = {
-            "high": high_count,
-            "normal": normal_count,
-            "weight": total_weight,
-            "usage": (total_weight / self.max_capacity) * 100
+            "high": self.priority_counts["High"],
+            "normal": self.priority_counts["Normal"],
+            "weight": self.current_weight,
+            "size": self.current_volume,
+            "usage": (self.current_weight / self.max_capacity) * 100
         }
         
-        self.stats = stats_dict
\ No newline at end of file
+        self.stats = stats_dict
+        return stats_dict